@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 import os
+import re
 import json
 import csv
 import io
 import math
+import time
+import hashlib
+import tempfile
+import datetime
+import secrets
+import importlib.util
+import bisect
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 # --- New library needed for text extraction ---
 # pip install PyMuPDF
@@ -15,26 +24,75 @@ import fitz  # PyMuPDF
 # pip install google-generativeai flask python-dotenv
 from dotenv import load_dotenv
 from flask import Flask, render_template, request, Response, session, redirect, url_for
-from werkzeug.utils import secure_filename
 
 import google.generativeai as genai
+from pydantic import BaseModel
 
 # ----------------------------- CONFIG ---------------------------------
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 if not API_KEY:
     raise RuntimeError("GEMINI_API_KEY environment variable not set.")
-genai.configure(api_key=API_KEY)
+# REST transport goes through the socket module, which gevent workers patch (gRPC would block them)
+genai.configure(api_key=API_KEY, transport="rest")
 
 BASE_DIR = Path(__file__).parent
 UPLOADS_DIR = BASE_DIR / "uploads"
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+# Generated response-cache entries live in their own subdirectory, which LRU eviction owns
+CACHE_DIR = BASE_DIR / "cache" / "responses"
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_SIZE_LIMIT = int(os.getenv("SOF_CACHE_SIZE_LIMIT", 2 * 1024 ** 3))  # bytes
+SESSIONS_DIR = BASE_DIR / "sessions"
+SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+SESSION_DATA_TTL_SECONDS = 60 * 60
+
+PAGE_BREAK = "\f"
+PAGES_PER_CHUNK = 30  # Longer text documents are split and extracted concurrently
+MAX_CONCURRENT_CHUNKS = 4  # Gemini calls in flight per document, to stay clear of rate limits
+
+# Short text SoFs fully resolved by the rule-based extractor in ../app3.py skip the LLM
+# (app3 needs PyMuPDF and reportlab, both in requirements.txt)
+REGEX_EXTRACTOR_PATH = BASE_DIR.parent / "app3.py"
+REGEX_MAX_CHARS = 2000
+REGEX_MIN_EVENTS = 3
+# Arrival/departure events the prompt excludes; documents with them go to the model
+REGEX_EXCLUDED_EVENTS = {"Arrived Pilot Station", "Vessel Sailed", "Eta Next Port"}
+# app3 reads "05.30" as a decimal hour (05:18), so documents with such times go to the model
+DECIMAL_TIME_RE = re.compile(r"\d{1,2}\.\d{2}")
+_regex_extractor: Any = None
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
 
+SECRET_KEY_FILE = BASE_DIR / ".secret"
+
+def load_secret_key() -> bytes:
+    """Returns FLASK_SECRET_KEY, or a random key persisted once so every worker and restart shares it."""
+    env_key = os.getenv("FLASK_SECRET_KEY")
+    if env_key:
+        return env_key.encode()
+    if not SECRET_KEY_FILE.exists():
+        with tempfile.NamedTemporaryFile(dir=BASE_DIR, delete=False) as f:
+            f.write(os.urandom(32))
+        try:
+            os.link(f.name, SECRET_KEY_FILE)  # Atomic; the first worker to get here wins
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(f.name)
+    return SECRET_KEY_FILE.read_bytes()
+
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24)
+app.config['SECRET_KEY'] = load_secret_key()
+
+# Flash is much faster than Pro on large scanned PDFs; set FORCE_PRO=1 to trade latency for accuracy
+LLM_MODEL = "gemini-2.5-pro" if os.getenv("FORCE_PRO") == "1" else "gemini-2.5-flash"
 
-LLM_MODEL = "gemini-2.5-flash" # Using a fast and efficient model
+# Gemini keeps uploaded files for 48 hours; reuse them until shortly before that.
+UPLOAD_TTL_SECONDS = 47 * 60 * 60
+UPLOAD_CACHE_SIZE = 128
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+_UPLOAD_CACHE: Dict[str, Tuple[Any, float]] = {}
 
 SOF_EXTRACTION_PROMPT = """
 You are an expert AI assistant specializing in logistics and shipping documentation. Your task is to meticulously extract all port operations events from the provided 'Statement of Facts' (SoF) document, strictly following the conditions and edge cases below.
@@ -112,63 +170,274 @@ Always return valid JSON with this structure:
 
 Now, analyze the following SoF document and provide the structured JSON output according to these rules.
 """
+PROMPT_HASH = hashlib.sha256(SOF_EXTRACTION_PROMPT.encode()).hexdigest()
+
+# Response schema enforced by Gemini's constrained decoding; mirrors the prompt's output format.
+class SofEvent(BaseModel):
+    event: str
+    start_time: Optional[str]
+    end_time: Optional[str]
+
+class UnresolvedEvent(BaseModel):
+    event: str
+
+class SofExtraction(BaseModel):
+    events: List[SofEvent]
+    unresolved_events: List[UnresolvedEvent]
+
+GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=SofExtraction,
+)
+_MODELS: Dict[str, genai.GenerativeModel] = {}
 
 # --------------------------- UTILITIES ---------------------------------
 
-def allowed_file(filename: str) -> bool:
-    """Checks if the uploaded file has an allowed extension."""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def get_file_extension(filename: str) -> str:
+    """Returns the lower-cased extension of a filename, or '' if it has none."""
+    _, dot, extension = filename.rpartition('.')
+    return extension.lower() if dot else ''
+
+def file_sha256(filepath: Path) -> str:
+    """Returns the SHA-256 hex digest of a file, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_upload(file, file_extension: str) -> Tuple[Path, str]:
+    """Streams an uploaded file to disk in chunks; returns its path and SHA-256 hex digest.
+
+    The file is stored under its content hash, so concurrent uploads sharing a
+    filename never overwrite each other's documents.
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=UPLOADS_DIR, delete=False) as dst:
+        try:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+        except BaseException:
+            dst.close()
+            os.unlink(dst.name)
+            raise
+    file_hash = digest.hexdigest()
+    filepath = UPLOADS_DIR / f"{file_hash}.{file_extension}"
+    os.replace(dst.name, filepath)
+    return filepath, file_hash
+
+def _write_json(path: Path, data: Any) -> None:
+    """Writes JSON through a temporary file so readers never see a partial file."""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, delete=False) as f:
+        json.dump(data, f)
+    os.replace(f.name, path)
+
+def _response_cache_path(content_hash: str) -> Path:
+    """Cache file for a document, keyed on its content, the prompt and the model."""
+    key = hashlib.sha256(f"{content_hash}:{PROMPT_HASH}:{LLM_MODEL}".encode()).hexdigest()
+    return CACHE_DIR / f"{key}.json"
+
+def load_cached_response(content_hash: str) -> Optional[Dict[str, Any]]:
+    """Returns a previously extracted result for this document, if any."""
+    path = _response_cache_path(content_hash)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        os.utime(path)  # Mark as recently used for eviction
+    except (OSError, ValueError):
+        return None
+    print(f"Using cached extraction: {path.name}")
+    return data
+
+def store_cached_response(content_hash: str, data: Dict[str, Any]) -> None:
+    """Saves an extraction result and evicts least recently used entries over the size limit."""
+    try:
+        _write_json(_response_cache_path(content_hash), data)
+
+        entries = [(p.stat(), p) for p in CACHE_DIR.glob('*.json')]
+        total = sum(st.st_size for st, _ in entries)
+        for st, p in sorted(entries, key=lambda e: e[0].st_mtime):
+            if total <= CACHE_SIZE_LIMIT:
+                break
+            p.unlink(missing_ok=True)
+            total -= st.st_size
+    except OSError as e:
+        print(f"Error writing response cache: {e}")
+
+def store_session_data(data: Any) -> str:
+    """Keeps request results on the server and returns the key to put in the session cookie."""
+    key = secrets.token_urlsafe(16)
+    _write_json(SESSIONS_DIR / f"{key}.json", data)
+
+    expired_before = time.time() - SESSION_DATA_TTL_SECONDS
+    for p in SESSIONS_DIR.glob('*.json'):
+        try:
+            if p.stat().st_mtime < expired_before:
+                p.unlink()
+        except OSError:
+            pass
+    return key
+
+def load_session_data(key: Optional[str]) -> Optional[Any]:
+    """Returns the data stored under a session key, or None if missing or expired."""
+    if not key or not key.replace('-', '').replace('_', '').isalnum():
+        return None
+    path = SESSIONS_DIR / f"{key}.json"
+    try:
+        if path.stat().st_mtime < time.time() - SESSION_DATA_TTL_SECONDS:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _get_or_upload(file_hash: str, filepath: Path):
+    """Returns the Gemini file for this content, uploading it only on a cache miss."""
+    now = time.time()
+    cached = _UPLOAD_CACHE.pop(file_hash, None)
+    if cached and cached[1] > now:
+        print(f"Reusing uploaded file: {cached[0].name}")
+        _UPLOAD_CACHE[file_hash] = cached  # Re-insert as most recently used
+        return cached[0]
+
+    uploaded_file = genai.upload_file(path=filepath)
+    _UPLOAD_CACHE[file_hash] = (uploaded_file, now + UPLOAD_TTL_SECONDS)
+    while len(_UPLOAD_CACHE) > UPLOAD_CACHE_SIZE:
+        _UPLOAD_CACHE.pop(next(iter(_UPLOAD_CACHE)))
+    return uploaded_file
 
 def extract_text_from_pdf(filepath: Path) -> str:
-    """Extracts all text content from a PDF file using PyMuPDF."""
-    text = ""
+    """Extracts all text content from a PDF file using PyMuPDF, pages separated by PAGE_BREAK."""
+    parts = []
     try:
         with fitz.open(filepath) as doc:
             for page in doc:
-                text += page.get_text()
+                parts.append(page.get_text())
     except Exception as e:
         print(f"Error extracting text with PyMuPDF: {e}")
         return ""
-    return text
+    return PAGE_BREAK.join(parts)
+
+def get_model() -> genai.GenerativeModel:
+    """Returns a shared model instance."""
+    model = _MODELS.get(LLM_MODEL)
+    if model is None:
+        model = genai.GenerativeModel(LLM_MODEL, generation_config=GENERATION_CONFIG)
+        _MODELS[LLM_MODEL] = model
+    return model
+
+def generate_sof_json(document: Any) -> Dict[str, Any]:
+    """Runs the extraction prompt on one document part (text or uploaded file)."""
+    response = get_model().generate_content([SOF_EXTRACTION_PROMPT, document])
+    return json.loads(response.text)
+
+def _get_regex_extractor():
+    """Loads app3's PDFEventExtractor once; returns None if it or its dependencies are missing."""
+    global _regex_extractor
+    if _regex_extractor is None:
+        try:
+            spec = importlib.util.spec_from_file_location("app3", REGEX_EXTRACTOR_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _regex_extractor = module.PDFEventExtractor()
+        except Exception as e:
+            print(f"Regex extractor unavailable, always using the AI model: {e}")
+            _regex_extractor = False
+    return _regex_extractor or None
+
+def extract_sof_data_with_regex(document_text: str) -> Optional[Dict[str, Any]]:
+    """Extracts short, simple SoFs without the LLM when every timed line is a known event
+    with its own date and time.
+
+    Returns None when the document should go to the AI model instead.
+    """
+    if len(document_text) >= REGEX_MAX_CHARS or DECIMAL_TIME_RE.search(document_text):
+        return None
+    extractor = _get_regex_extractor()
+    if extractor is None:
+        return None
+    # app3 knows only a fixed set of event phrases; any other timed line (e.g. loading or a
+    # rain delay) would be dropped and shift the end times derived below
+    if extractor.find_unmatched_timed_lines(document_text):
+        return None
+
+    # No borrowing dates or times from neighbouring lines: the prompt forbids guessing times
+    found = extractor.extract_events(document_text, use_context=False)
+    if len(found["Event"]) < REGEX_MIN_EVENTS or REGEX_EXCLUDED_EVENTS.intersection(found["Event"]):
+        return None
+    timed = []
+    for name, date, time_of_day in zip(found["Event"], found["Date"], found["Time"]):
+        try:
+            start = datetime.datetime.strptime(f"{date} {time_of_day}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            return None  # Unresolved date or time; let the model handle it
+        timed.append((start, name))
+
+    # Same rule as the prompt: an event ends when the next one starts
+    timed.sort(key=lambda t: t[0])
+    starts = sorted({start for start, _ in timed})
+    events = []
+    for start, name in timed:
+        i = bisect.bisect_right(starts, start)
+        events.append({
+            "event": name,
+            "start_time": start.strftime("%Y-%m-%d %H:%M"),
+            "end_time": starts[i].strftime("%Y-%m-%d %H:%M") if i < len(starts) else None,
+        })
+    print(f"Resolved {len(events)} events with the regex extractor.")
+    return {"events": events, "unresolved_events": [], "source": "regex"}
+
+def merge_sof_results(results) -> Dict[str, Any]:
+    """Combines per-chunk extraction results, dropping events repeated across chunk edges."""
+    events, unresolved_events, seen = [], [], set()
+    for result in results:
+        for event in result.get("events", []):
+            key = (event.get("event"), event.get("start_time"), event.get("end_time"))
+            if key not in seen:
+                seen.add(key)
+                events.append(event)
+        unresolved_events.extend(result.get("unresolved_events", []))
+    return {"events": events, "unresolved_events": unresolved_events}
 
 def extract_sof_data_from_text(document_text: str) -> Dict[str, Any]:
     """Sends extracted text to the Gemini API for processing."""
     print("Processing extracted text with the AI model.")
+    text_hash = hashlib.sha256(document_text.encode()).hexdigest()
+    cached = load_cached_response(text_hash)
+    if cached is not None:
+        return cached
     try:
-        model = genai.GenerativeModel(
-            LLM_MODEL,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json"
-            )
-        )
-        response = model.generate_content([SOF_EXTRACTION_PROMPT, document_text])
-        return json.loads(response.text)
+        pages = document_text.split(PAGE_BREAK)
+        if len(pages) <= PAGES_PER_CHUNK:
+            data = generate_sof_json(document_text)
+        else:
+            chunks = [PAGE_BREAK.join(pages[i:i + PAGES_PER_CHUNK])
+                      for i in range(0, len(pages), PAGES_PER_CHUNK)]
+            print(f"Processing {len(pages)} pages as {len(chunks)} concurrent chunks.")
+            with ThreadPoolExecutor(max_workers=min(len(chunks), MAX_CONCURRENT_CHUNKS)) as executor:
+                data = merge_sof_results(executor.map(generate_sof_json, chunks))
+        store_cached_response(text_hash, data)
+        return data
     except Exception as e:
         print(f"Error during AI data extraction from text: {e}")
         return {"error": f"Failed to process text with AI model: {e}"}
 
-def extract_sof_data_from_file(filepath: Path) -> Dict[str, Any]:
+def extract_sof_data_from_file(filepath: Path, file_hash: Optional[str] = None) -> Dict[str, Any]:
     """Uploads a document file (PDF, DOCX) to the Gemini API."""
     print(f"Uploading and processing file: {filepath.name}")
-    uploaded_file = None
     try:
-        uploaded_file = genai.upload_file(path=filepath)
-        model = genai.GenerativeModel(
-            LLM_MODEL,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json"
-            )
-        )
-        response = model.generate_content([SOF_EXTRACTION_PROMPT, uploaded_file])
-        return json.loads(response.text)
+        file_hash = file_hash or file_sha256(filepath)
+        cached = load_cached_response(file_hash)
+        if cached is not None:
+            return cached
+        uploaded_file = _get_or_upload(file_hash, filepath)
+        data = generate_sof_json(uploaded_file)
+        store_cached_response(file_hash, data)
+        return data
     except Exception as e:
         print(f"Error during AI data extraction from file: {e}")
         return {"error": f"Failed to extract data from file with AI model: {e}"}
-    finally:
-        if uploaded_file:
-            print(f"Deleting uploaded file: {uploaded_file.name}")
-            genai.delete_file(uploaded_file.name)
 
 
 # ------------------------------ FLASK ROUTES ---------------------------------
@@ -191,29 +460,28 @@ def upload_and_process_sof() -> str:
         render_ctx["error"] = "No file selected. Please choose a PDF or Word document."
         return render_template("index.html", **render_ctx)
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = UPLOADS_DIR / filename
-        file.save(filepath)
+    file_extension = get_file_extension(file.filename)
+    if file and file_extension in ALLOWED_EXTENSIONS:
+        filepath, file_hash = save_upload(file, file_extension)
 
         extracted_data = {}
-        file_extension = filename.rsplit('.', 1)[1].lower()
 
         if file_extension == 'docx':
             print("Processing as a DOCX document (using file upload).")
-            extracted_data = extract_sof_data_from_file(filepath)
+            extracted_data = extract_sof_data_from_file(filepath, file_hash)
         elif file_extension == 'pdf':
             pdf_type = request.form.get('pdf_type', 'scanned')
             if pdf_type == 'scanned':
                 print("Processing as a SCANNED PDF (using file upload).")
-                extracted_data = extract_sof_data_from_file(filepath)
+                extracted_data = extract_sof_data_from_file(filepath, file_hash)
             else:
                 print("Processing as a TEXT-BASED PDF (extracting text first).")
                 document_text = extract_text_from_pdf(filepath)
                 if not document_text.strip():
                     extracted_data = {"error": "Could not extract text. The PDF might be image-based. Try the 'Scanned' option."}
                 else:
-                    extracted_data = extract_sof_data_from_text(document_text)
+                    extracted_data = (extract_sof_data_with_regex(document_text)
+                                      or extract_sof_data_from_text(document_text))
 
         # --- NEW: Calculate stats for the results page ---
         if "error" in extracted_data:
@@ -230,8 +498,8 @@ def upload_and_process_sof() -> str:
             if total_items > 0:
                 success_rate = math.floor((resolved_count / total_items) * 100)
 
-            # Store main data in session for download links
-            session['sof_data'] = resolved_events
+            # Store main data server-side; the session only carries its key
+            session['sof_key'] = store_session_data(resolved_events)
             
             # Add all data and stats to the render context
             render_ctx['events'] = resolved_events
@@ -246,10 +514,10 @@ def upload_and_process_sof() -> str:
         render_ctx["error"] = "Invalid file type. Please upload a PDF (.pdf) or Word (.docx) file."
         return render_template("index.html", **render_ctx)
 
-# Download route remains unchanged
 @app.get("/download/<filetype>")
 def download_file(filetype: str):
-    events = session.get('sof_data', [])
+    """Downloads this session's resolved events as JSON or streamed CSV."""
+    events = load_session_data(session.get('sof_key')) or []
     if not events:
         return redirect(url_for('index'))
 
@@ -260,13 +528,19 @@ def download_file(filetype: str):
             headers={"Content-Disposition": "attachment;filename=sof_events.json"}
         )
     elif filetype == 'csv':
-        output = io.StringIO()
-        if events:
-            writer = csv.DictWriter(output, fieldnames=events[0].keys())
+        def generate_csv():
+            # Reuse one small buffer so only a single row is held in memory at a time
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=events[0].keys())
             writer.writeheader()
-            writer.writerows(events)
+            for row in events:
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
         return Response(
-            output.getvalue(),
+            generate_csv(),
             mimetype="text/csv",
             headers={"Content-Disposition": "attachment;filename=sof_events.csv"}
         )
@@ -274,4 +548,5 @@ def download_file(filetype: str):
 
 # ------------------------------ MAIN -----------------------------------
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8081, debug=True)
+    # Development server only; use gunicorn with gunicorn_conf.py to serve requests concurrently
+    app.run(host="0.0.0.0", port=8081, debug=os.getenv("FLASK_DEBUG") == "1")
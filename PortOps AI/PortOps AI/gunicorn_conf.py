@@ -0,0 +1,15 @@
+# Gunicorn settings for serving the app in production:
+#   gunicorn -c gunicorn_conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8081')}"
+
+# Requests spend almost all their time waiting on Gemini, so cooperative
+# gevent workers keep many of them in flight per process. The gevent worker
+# monkey-patches the standard library before the app is imported.
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_connections = 100
+
+# Large scanned SoFs can take minutes to extract
+timeout = 300
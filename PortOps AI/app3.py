@@ -1,120 +1,429 @@
-import PyPDF2
-import pdfplumber
+import fitz  # PyMuPDF
 import re
-from datetime import datetime
-import pandas as pd
+import csv
+import zipfile
+from datetime import date
+from functools import lru_cache
+from collections import deque
+from itertools import chain, islice
+try:
+    import re2  # google-re2, optional linear-time engine for the pattern scans
+except ImportError:
+    re2 = None
+try:
+    import pdftotext  # Poppler bindings, optional faster text extraction
+except ImportError:
+    pdftotext = None
+try:
+    import xlsxwriter  # optional, preferred XLSX writer when installed
+except ImportError:
+    xlsxwriter = None
+from xml.sax.saxutils import escape as xml_escape
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 import sys
-import os
+from pathlib import Path
+
+MAX_PAGES = 30  # Limit to 30 pages
+TABLE_CHUNK_ROWS = 200  # Events per PDF table, keeps ReportLab layout cost bounded
+
+# Columns of the events table; extract_events returns one list per column
+EVENT_COLUMNS = ('Event', 'Date', 'Time')
+
+# Month names and abbreviations accepted in dates, matched case-insensitively
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+]
+
+# Common event patterns found in maritime/shipping documents
+EVENT_PATTERNS = [
+    r'notice of readiness',
+    r'dropped anchor',
+    r'pilot on board',
+    r'free pratique granted',
+    r'commence.*survey',
+    r'cargo operation',
+    r'vessel sailed',
+    r'arrived pilot station',
+    r'nor tendered',
+    r'first line ashore',
+    r'all fast',
+    r'cargo documentation',
+    r'eta next port',
+    r'completed.*survey',
+    r'commenced.*operation'
+]
+
+# Date patterns
+DATE_PATTERNS = [
+    r'\d{4}-\d{2}-\d{2}',  # 2019-10-11
+    r'\d{2}-\d{2}-\d{4}',  # 11-10-2019
+    r'\d{1,2}th\s+\w+\s+\d{4}',  # 11th October 2019
+    r'\w+\s+\d{1,2},?\s+\d{4}',  # October 11, 2019
+]
+
+# Time patterns
+TIME_PATTERNS = [
+    r'\d{2}:\d{2}',  # 05:00
+    r'\d{1,2}\.\d{2}',  # 5.00
+    r'\d{2}\s*HRS',  # 05 HRS
+]
+
+def _alternation(patterns, prefix='p'):
+    """Join patterns into an alternation with one named group per pattern, e.g. p0, p1"""
+    return '|'.join(f'(?P<{prefix}{i}>{p})' for i, p in enumerate(patterns))
+
+def _fuse_patterns(patterns, flags=0):
+    """Combine patterns into one alternation, one numbered group per pattern.
+
+    The alternation sits in a lookahead so matches may overlap and a long
+    low-priority match cannot hide a higher-priority one inside it.
+    """
+    return re.compile(f'(?=(?:{_alternation(patterns)}))', flags)
+
+def _first_match(regex, text):
+    """Return the text matched by the earliest listed pattern, as if tried one by one"""
+    if isinstance(regex, _Re2PatternSet):
+        return regex.first(text)
+    best = None
+    for match in regex.finditer(text):
+        if best is None or match.lastindex < best.lastindex:
+            best = match
+            if best.lastindex == 1:
+                break
+    return best.group(best.lastindex) if best else None
+
+def _first_date_time(regex, text):
+    """Return the earliest listed date and time patterns' matches from one combined scan"""
+    # Every date and time pattern needs a digit; most lines have none
+    if not _DIGIT_RE.search(text):
+        return None, None
+    if isinstance(regex, _Re2PatternSet):
+        hits = regex.search(text) or ()
+        date = min((i for i in hits if i < len(DATE_PATTERNS)), default=None)
+        time = min((i for i in hits if i >= len(DATE_PATTERNS)), default=None)
+        return (
+            regex.group(date, text) if date is not None else None,
+            regex.group(time, text) if time is not None else None,
+        )
+    
+    best = {'d': (len(DATE_PATTERNS), None), 't': (len(TIME_PATTERNS), None)}
+    for match in regex.finditer(text):
+        found = [(match.lastgroup[0], int(match.lastgroup[1:]), match.group(match.lastgroup))]
+        if found[0][0] == 'd':
+            # Dates come first in the alternation, so check for a time hidden behind one
+            hidden = _TIME_AT_RE.match(text, match.start())
+            if hidden:
+                found.append(('t', hidden.lastindex - 1, hidden.group(hidden.lastindex)))
+        for kind, rank, matched in found:
+            if rank < best[kind][0]:
+                best[kind] = (rank, matched)
+        if best['d'][0] == 0 and best['t'][0] == 0:
+            break
+    return best['d'][1], best['t'][1]
+
+def _event_rows(events):
+    """Iterate (event, date, time) rows of the column lists extract_events returns"""
+    return zip(*(events[column] for column in EVENT_COLUMNS))
+
+@lru_cache(maxsize=4096)
+def _title(text):
+    """Title-case an event name, cached because the same names repeat through a document"""
+    # Names already in title case are returned as-is rather than rebuilt
+    return text if text.istitle() else text.title()
+
+def _line_windows(lines, before=2, after=2):
+    """Yield each line with the lines around it, holding only the window in memory"""
+    window = deque([None] * before, maxlen=before + after + 1)
+    for line in chain(lines, [None] * after):
+        window.append(line)
+        if len(window) == window.maxlen:
+            yield window[before], [l for l in window if l is not None]
+
+# RE2 classes are ASCII-only; widen them to match what Python's Unicode classes do
+_RE2_UNICODE_CLASSES = {
+    r'\s': r'[\s\v\x1c-\x1f\x85\p{Z}]',
+    r'\w': r'[\p{L}\p{N}_]',
+    r'\d': r'\p{Nd}',
+}
+
+class _Re2PatternSet:
+    """RE2 counterpart of a fused regex, used when google-re2 is installed.
+
+    RE2 has no lookahead, so an RE2 Set reports in one linear-time pass which
+    patterns hit and only the earliest listed one is searched again for its text.
+    """
+
+    def __init__(self, patterns, ignorecase=False, unicode=True):
+        options = re2.Options()
+        options.case_sensitive = not ignorecase
+        if unicode:
+            patterns = [
+                re.sub(r'\\[swd]', lambda m: _RE2_UNICODE_CLASSES[m.group()], p)
+                for p in patterns
+            ]
+        self._set = re2.Set.SearchSet(options)
+        for pattern in patterns:
+            self._set.Add(pattern)
+        self._set.Compile()
+        self._patterns = [re2.compile(p, options) for p in patterns]
+
+    def search(self, text):
+        return self._set.Match(text)
+
+    def group(self, index, text):
+        return self._patterns[index].search(text).group()
+
+    def first(self, text):
+        hits = self._set.Match(text)
+        return self.group(min(hits), text) if hits else None
+
+# Events are fused into one regex, dates and times into another (groups d0.., t0..),
+# so a line is scanned at most twice. Event patterns are plain ASCII literals, so
+# re.ASCII skips Unicode case folding; date and time patterns keep Unicode \s so
+# non-breaking spaces from PDFs still match.
+if re2 is not None:
+    _EVENT_RE = _Re2PatternSet(EVENT_PATTERNS, ignorecase=True, unicode=False)
+    _DATE_TIME_RE = _Re2PatternSet(DATE_PATTERNS + TIME_PATTERNS)
+else:
+    _EVENT_RE = _fuse_patterns(EVENT_PATTERNS, re.IGNORECASE | re.ASCII)
+    _DATE_TIME_RE = re.compile(
+        f'(?=(?:{_alternation(DATE_PATTERNS, "d")}|{_alternation(TIME_PATTERNS, "t")}))'
+    )
+_TIME_AT_RE = _fuse_patterns(TIME_PATTERNS)
+
+# Helpers used while normalizing and cleaning matches
+_ORDINAL_RE = re.compile(r'(\d+)(st|nd|rd|th)')
+_TIME_SUFFIX_RE = re.compile(r'\s*(HRS|HOURS?)\s*$')
+_WHITESPACE_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\d')
+_NUMERIC_DATE_RE = re.compile(r'([0-9]+)-([0-9]+)-([0-9]+)')  # 2019-10-11, 11-10-2019
+_DAY_MONTH_DATE_RE = re.compile(r'([0-9]+)\s+(\w+)\s+([0-9]+)')  # 11 October 2019
+_MONTH_DAY_DATE_RE = re.compile(r'(\w+)\s+([0-9]+),\s+([0-9]+)')  # October 11, 2019
+_MONTHS = {
+    key: number
+    for number, name in enumerate(MONTH_NAMES, start=1)
+    for key in (name.lower(), name[:3].lower())
+}
+
+def _iso_date(year, month, day):
+    """Format a date as YYYY-MM-DD, or return None if no such date exists"""
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+def _parse_date(date_str):
+    """Parse the date shapes DATE_PATTERNS produce to YYYY-MM-DD, or None"""
+    match = _NUMERIC_DATE_RE.fullmatch(date_str)
+    if match:
+        first, second, third = match.groups()
+        if len(first) == 4 and len(second) <= 2 and len(third) <= 2:
+            return _iso_date(int(first), int(second), int(third))
+        if len(third) == 4 and len(first) <= 2 and len(second) <= 2:
+            # Day first, then month first if that is not a real date
+            return (_iso_date(int(third), int(second), int(first))
+                    or _iso_date(int(third), int(first), int(second)))
+        return None
+    
+    match = _DAY_MONTH_DATE_RE.fullmatch(date_str)
+    if match:
+        day, month, year = match.groups()
+    else:
+        match = _MONTH_DAY_DATE_RE.fullmatch(date_str)
+        if not match:
+            return None
+        month, day, year = match.groups()
+    month = _MONTHS.get(month.lower())
+    if month is None or len(day) > 2 or len(year) != 4:
+        return None
+    return _iso_date(int(year), month, int(day))
+
+# Fixed parts of a minimal XLSX package holding a single "Events" sheet
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Events" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _xlsx_row(index, values):
+    """Render one worksheet row of inline-string cells"""
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{xml_escape(_XML_INVALID_CHARS.sub("", str(value)))}</t></is></c>'
+        for value in values
+    )
+    return f'<row r="{index}">{cells}</row>'
+
+def _write_xlsx_direct(events, output_path):
+    """Write events as an XLSX file by emitting the package XML directly.
+
+    Every cell is an inline string, so no shared-strings table is needed and
+    the sheet is streamed into the zip one row at a time.
+    """
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, xml)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(1, EVENT_COLUMNS).encode())
+            for index, row in enumerate(_event_rows(events), 2):
+                sheet.write(_xlsx_row(index, row).encode())
+            sheet.write(b'</sheetData></worksheet>')
+
+def _write_xlsx_xlsxwriter(events, output_path):
+    """Write events as an XLSX file with xlsxwriter, flushing each row as it goes.
+
+    Cells are always plain strings, so URL and formula detection (a regex check
+    per cell) are turned off; this also matches what the built-in writer emits.
+    """
+    workbook = xlsxwriter.Workbook(output_path, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+    })
+    worksheet = workbook.add_worksheet('Events')
+    worksheet.write_row(0, 0, EVENT_COLUMNS)
+    for index, row in enumerate(_event_rows(events), 1):
+        worksheet.write_row(index, 0, row)
+    workbook.close()
+
+# Layout of the events table in the structured PDF, built once
+_COL_WIDTHS = [3*inch, 1.5*inch, 1*inch]
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+])
+
+@lru_cache(maxsize=None)
+def _pdf_flowables():
+    """Build the structured PDF's title and "no events" paragraphs.
+
+    Built on first use and shared by every extractor, so extracting events
+    without rendering a PDF never pays for the ReportLab style sheet.
+    """
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.darkblue,
+        alignment=1  # Center alignment
+    )
+    title = Paragraph("Extracted Events Timeline", title_style)
+    no_data = Paragraph("No events found in the PDF.", styles['Normal'])
+    return title, no_data
 
 class PDFEventExtractor:
     def __init__(self):
-        # Common event patterns found in maritime/shipping documents
-        self.event_patterns = [
-            r'notice of readiness',
-            r'dropped anchor',
-            r'pilot on board',
-            r'free pratique granted',
-            r'commence.*survey',
-            r'cargo operation',
-            r'vessel sailed',
-            r'arrived pilot station',
-            r'nor tendered',
-            r'first line ashore',
-            r'all fast',
-            r'cargo documentation',
-            r'eta next port',
-            r'completed.*survey',
-            r'commenced.*operation'
-        ]
-        
-        # Date patterns
-        self.date_patterns = [
-            r'\d{4}-\d{2}-\d{2}',  # 2019-10-11
-            r'\d{2}-\d{2}-\d{4}',  # 11-10-2019
-            r'\d{1,2}th\s+\w+\s+\d{4}',  # 11th October 2019
-            r'\w+\s+\d{1,2},?\s+\d{4}',  # October 11, 2019
-        ]
-        
-        # Time patterns
-        self.time_patterns = [
-            r'\d{2}:\d{2}',  # 05:00
-            r'\d{1,2}\.\d{2}',  # 5.00
-            r'\d{2}\s*HRS',  # 05 HRS
-        ]
+        # Patterns are compiled once at import time and shared by every extractor
+        self.event_re = _EVENT_RE
+        self.date_time_re = _DATE_TIME_RE
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF using multiple methods for better accuracy"""
-        text_content = []
+    def _iter_pages(self, pdf_path, max_pages=MAX_PAGES):
+        """Yield the text of each non-empty page, loading one page at a time"""
+        if pdftotext is not None:
+            found_text = False
+            for text in self._iter_pages_poppler(pdf_path, max_pages):
+                found_text = True
+                yield text
+            if found_text:
+                return
         
+        # MuPDF handles the PDFs Poppler can't open or finds no text in
         try:
-            # Method 1: Use pdfplumber (better for complex layouts)
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    if page_num >= 30:  # Limit to 30 pages
-                        break
-                    text = page.extract_text()
+            with fitz.open(pdf_path) as doc:
+                for i in range(min(len(doc), max_pages)):
+                    text = doc[i].get_text()
                     if text:
-                        text_content.append(text)
-        except:
-            # Method 2: Fallback to PyPDF2
-            try:
-                with open(pdf_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    for page_num in range(min(len(reader.pages), 30)):
-                        page = reader.pages[page_num]
-                        text = page.extract_text()
-                        if text:
-                            text_content.append(text)
-            except Exception as e:
-                print(f"Error extracting text: {e}")
-                return ""
-        
-        return "\n".join(text_content)
+                        yield text
+        except Exception as e:
+            print(f"Error extracting text: {e}")
+
+    def _iter_pages_poppler(self, pdf_path, max_pages):
+        """Yield non-empty page texts using pdftotext, keeping the physical layout"""
+        try:
+            with open(pdf_path, 'rb') as f:
+                pdf = pdftotext.PDF(f, physical=True)
+        except (OSError, pdftotext.Error):
+            return
+        for i in range(min(len(pdf), max_pages)):
+            text = pdf[i]
+            if text.strip():
+                yield text
+
+    def extract_text_from_pdf(self, pdf_path):
+        """Extract text from PDF using Poppler when available, otherwise PyMuPDF"""
+        return "\n".join(self._iter_pages(pdf_path))
 
     def normalize_date(self, date_str):
         """Normalize different date formats to YYYY-MM-DD"""
-        date_str = date_str.strip()
-        
-        # Try different date formats
-        formats = [
-            '%Y-%m-%d',
-            '%d-%m-%Y',
-            '%m-%d-%Y',
-            '%d %B %Y',
-            '%B %d, %Y',
-            '%d %b %Y',
-            '%b %d, %Y'
-        ]
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_str, fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except:
-                continue
-        
-        # Handle special cases like "11th October 2019"
-        date_str = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str)
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_str, fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except:
-                continue
+        # Drop ordinals to handle special cases like "11th October 2019"
+        date_str = _ORDINAL_RE.sub(r'\1', date_str.strip())
         
-        return date_str  # Return original if can't parse
+        # Keep the ordinal-stripped text if the date can't be parsed
+        return _parse_date(date_str) or date_str
 
     def normalize_time(self, time_str):
         """Normalize different time formats to HH:MM"""
         time_str = time_str.strip().upper()
         
         # Remove common suffixes
-        time_str = re.sub(r'\s*(HRS|HOURS?)\s*$', '', time_str)
+        time_str = _TIME_SUFFIX_RE.sub('', time_str)
         
         # Convert decimal format to HH:MM
         if '.' in time_str:
@@ -138,210 +447,194 @@ class PDFEventExtractor:
         
         return time_str
 
-    def extract_events(self, text):
-        """Extract events with dates and times from text"""
-        events = []
-        lines = text.split('\n')
+    def extract_events(self, text, use_context=True):
+        """Extract events with dates and times from text or an iterable of page texts.
+
+        With use_context=False a date or time missing from an event's own line
+        is left as 'N/A' instead of being taken from the lines around it.
+        Returns a dict holding one list per column in EVENT_COLUMNS.
+        """
+        events = {column: [] for column in EVENT_COLUMNS}
+        pages = [text] if isinstance(text, str) else text
+        lines = (line for page in pages for line in page.split('\n'))
         
-        for line in lines:
+        for line, nearby in _line_windows(lines):
             line = line.strip()
             if not line:
                 continue
             
             # Look for event patterns
-            for pattern in self.event_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    event_name = self.clean_event_name(line, pattern)
-                    
-                    # Extract date
-                    date_match = None
-                    for date_pattern in self.date_patterns:
-                        match = re.search(date_pattern, line)
-                        if match:
-                            date_match = match.group()
-                            break
-                    
-                    # Extract time
-                    time_match = None
-                    for time_pattern in self.time_patterns:
-                        match = re.search(time_pattern, line)
-                        if match:
-                            time_match = match.group()
-                            break
-                    
-                    # Look for date/time in nearby lines if not found
-                    if not date_match or not time_match:
-                        # Check context (previous and next lines)
-                        line_idx = lines.index(line)
-                        context_lines = []
-                        for i in range(max(0, line_idx-2), min(len(lines), line_idx+3)):
-                            context_lines.append(lines[i])
-                        
-                        context = ' '.join(context_lines)
-                        
-                        if not date_match:
-                            for date_pattern in self.date_patterns:
-                                match = re.search(date_pattern, context)
-                                if match:
-                                    date_match = match.group()
-                                    break
-                        
-                        if not time_match:
-                            for time_pattern in self.time_patterns:
-                                match = re.search(time_pattern, context)
-                                if match:
-                                    time_match = match.group()
-                                    break
-                    
-                    # Clean and normalize
-                    if date_match:
-                        date_match = self.normalize_date(date_match)
-                    if time_match:
-                        time_match = self.normalize_time(time_match)
-                    
-                    events.append({
-                        'Event': event_name,
-                        'Date': date_match or 'N/A',
-                        'Time': time_match or 'N/A'
-                    })
-                    break
+            if not self.event_re.search(line):
+                continue
+            event_name = self.clean_event_name(line)
+            
+            # Extract date and time
+            date_match, time_match = _first_date_time(self.date_time_re, line)
+            
+            # Look for date/time in nearby lines if not found
+            if use_context and (not date_match or not time_match):
+                # Check context (previous and next lines)
+                context_date, context_time = _first_date_time(self.date_time_re, ' '.join(nearby))
+                date_match = date_match or context_date
+                time_match = time_match or context_time
+            
+            # Clean and normalize
+            if date_match:
+                date_match = self.normalize_date(date_match)
+            if time_match:
+                time_match = self.normalize_time(time_match)
+            
+            events['Event'].append(event_name)
+            events['Date'].append(date_match or 'N/A')
+            events['Time'].append(time_match or 'N/A')
         
         return events
 
-    def clean_event_name(self, line, pattern):
+    def find_unmatched_timed_lines(self, text):
+        """Return the lines holding a date or time but none of the known event patterns"""
+        unmatched = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line or self.event_re.search(line):
+                continue
+            if any(_first_date_time(self.date_time_re, line)):
+                unmatched.append(line)
+        return unmatched
+
+    def clean_event_name(self, line):
         """Clean and extract event name from line"""
         # Remove extra whitespace and common prefixes/suffixes
-        line = re.sub(r'\s+', ' ', line).strip()
+        line = _WHITESPACE_RE.sub(' ', line).strip()
         
         # Try to extract just the event name
-        match = re.search(pattern, line, re.IGNORECASE)
-        if match:
-            event_name = match.group()
-            return event_name.title()
+        event_name = _first_match(self.event_re, line)
+        if event_name:
+            return _title(event_name)
         
-        return line.title()
+        return _title(line)
 
     def create_structured_pdf(self, events, output_path):
         """Create a structured PDF with the extracted events"""
-        doc = SimpleDocTemplate(output_path, pagesize=letter)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.darkblue,
-            alignment=1  # Center alignment
-        )
-        title = Paragraph("Extracted Events Timeline", title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
+        doc = SimpleDocTemplate(str(output_path), pagesize=letter)
+        title, no_data = _pdf_flowables()
+        story = [title, Spacer(1, 20)]
         
-        if not events:
-            no_data = Paragraph("No events found in the PDF.", styles['Normal'])
+        if not events['Event']:
             story.append(no_data)
         else:
-            # Create table data
-            table_data = [['Event', 'Date', 'Time']]  # Headers
-            
-            for event in events:
-                table_data.append([
-                    event['Event'],
-                    event['Date'],
-                    event['Time']
-                ])
-            
-            # Create table
-            table = Table(table_data, colWidths=[3*inch, 1.5*inch, 1*inch])
-            
-            # Style the table
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-            ]))
-            
-            story.append(table)
+            # Split long lists into several tables, each with the header row
+            # repeated on every page it spans; rows are the zipped column tuples
+            rows = _event_rows(events)
+            for _ in range(0, len(events['Event']), TABLE_CHUNK_ROWS):
+                table_data = [EVENT_COLUMNS, *islice(rows, TABLE_CHUNK_ROWS)]
+                story.append(Table(table_data, colWidths=_COL_WIDTHS, repeatRows=1, style=_TABLE_STYLE))
         
         # Build PDF
         doc.build(story)
         print(f"Structured PDF created: {output_path}")
 
-    def save_to_excel(self, events, output_path):
-        """Save events to Excel file"""
-        df = pd.DataFrame(events)
-        df.to_excel(output_path, index=False)
+    def save_to_excel(self, events, output_path, engine=None):
+        """Save events to Excel file with engine 'xlsxwriter' or 'direct' (built-in writer).
+
+        By default xlsxwriter is used when installed, otherwise the built-in writer.
+        """
+        if engine is None:
+            engine = 'xlsxwriter' if xlsxwriter is not None else 'direct'
+        if engine == 'xlsxwriter':
+            if xlsxwriter is None:
+                raise ImportError("engine='xlsxwriter' requires: pip install xlsxwriter")
+            _write_xlsx_xlsxwriter(events, output_path)
+        elif engine == 'direct':
+            _write_xlsx_direct(events, output_path)
+        else:
+            raise ValueError(f"Unknown Excel engine: {engine}")
         print(f"Excel file created: {output_path}")
 
-    def process_pdf(self, input_pdf_path, output_dir="output"):
-        """Main function to process PDF and create structured output"""
-        if not os.path.exists(input_pdf_path):
+    def save_to_csv(self, events, output_path):
+        """Save events to CSV file"""
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(EVENT_COLUMNS)
+            writer.writerows(_event_rows(events))
+        print(f"CSV file created: {output_path}")
+
+    def process_pdf(self, input_pdf_path, output_dir="output", excel=False):
+        """Main function to process PDF and create structured output.
+
+        Events are saved as CSV; pass excel=True for an Excel file instead.
+        """
+        input_pdf_path = Path(input_pdf_path)
+        if not input_pdf_path.is_file():
             print(f"Error: File {input_pdf_path} not found!")
             return
         
         # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
         print(f"Processing: {input_pdf_path}")
         
-        # Extract text
-        text = self.extract_text_from_pdf(input_pdf_path)
-        if not text:
+        # Stream page text straight into the extractor
+        pages = self._iter_pages(input_pdf_path)
+        first_page = next(pages, None)
+        if first_page is None:
             print("No text could be extracted from the PDF!")
             return
         
         # Extract events
-        events = self.extract_events(text)
+        events = self.extract_events(chain([first_page], pages))
         
-        if not events:
+        if not events['Event']:
             print("No events found in the PDF!")
             return
         
-        print(f"Found {len(events)} events:")
-        for event in events:
-            print(f"  - {event['Event']} | {event['Date']} | {event['Time']}")
+        print(f"Found {len(events['Event'])} events:")
+        for event, event_date, event_time in _event_rows(events):
+            print(f"  - {event} | {event_date} | {event_time}")
         
         # Generate output files
-        base_name = os.path.splitext(os.path.basename(input_pdf_path))[0]
+        base_name = input_pdf_path.stem
         
         # Create structured PDF
-        pdf_output = os.path.join(output_dir, f"{base_name}_structured.pdf")
+        pdf_output = output_dir / f"{base_name}_structured.pdf"
         self.create_structured_pdf(events, pdf_output)
         
-        # Create Excel file
-        excel_output = os.path.join(output_dir, f"{base_name}_events.xlsx")
-        self.save_to_excel(events, excel_output)
+        # Create CSV file, or Excel file when asked for
+        if excel:
+            self.save_to_excel(events, output_dir / f"{base_name}_events.xlsx")
+        else:
+            self.save_to_csv(events, output_dir / f"{base_name}_events.csv")
         
         return events
 
 def main():
     """Main function to run the script"""
     extractor = PDFEventExtractor()
+    args = sys.argv[1:]
+    excel = '--excel' in args
+    if excel:
+        args.remove('--excel')
     
     # Get input file from user
-    if len(sys.argv) > 1:
-        input_pdf = sys.argv[1]
+    if args:
+        input_pdf = args[0]
+    elif not sys.stdin.isatty():
+        # Piped input (batch runs): read the path without prompting
+        input_pdf = sys.stdin.readline().strip()
     else:
         input_pdf = input("Enter the path to your PDF file: ").strip()
     
     # Process the PDF
-    events = extractor.process_pdf(input_pdf)
+    events = extractor.process_pdf(input_pdf, excel=excel)
     
     if events:
         print("\n" + "="*50)
         print("SUCCESS! Structured files created in 'output' directory:")
         print("- PDF: Contains formatted table of events")
-        print("- Excel: Contains events data for further analysis")
+        if excel:
+            print("- Excel: Contains events data for further analysis")
+        else:
+            print("- CSV: Contains events data for further analysis")
         print("="*50)
 
 if __name__ == "__main__":
@@ -353,22 +646,28 @@ if __name__ == "__main__":
 
 # Requirements to install:
 """
-pip install PyPDF2 pdfplumber pandas reportlab openpyxl
+pip install PyMuPDF reportlab
+pip install google-re2  # optional, faster event/date/time scanning
+pip install pdftotext  # optional, faster text extraction (needs Poppler)
+pip install xlsxwriter  # optional, preferred Excel writer when installed
 """
 
 # Usage instructions:
 """
 1. Save this script as 'pdf_event_extractor.py'
-2. Install required packages: pip install PyPDF2 pdfplumber pandas reportlab openpyxl
+2. Install required packages: pip install PyMuPDF reportlab
 3. Run: python pdf_event_extractor.py your_file.pdf
    OR
    Run: python pdf_event_extractor.py
    Then enter the file path when prompted
+   OR
+   Run: echo your_file.pdf | python pdf_event_extractor.py
+   Add --excel to save the events as an Excel file instead of CSV
 
 The script will:
 - Extract text from up to 30 pages
 - Find events, dates, and times
 - Create a structured PDF with a clean table
-- Create an Excel file for data analysis
+- Create a CSV file (or Excel file with --excel) for data analysis
 - Handle messy, scanned, and normal PDFs
 """
\ No newline at end of file